@@ -0,0 +1,18 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+
+
+class QueueListenerHandler(logging.handlers.QueueHandler):
+    """
+    Logging handler that only puts records on a queue; a background QueueListener thread
+    writes them to stderr, so request handlers never block on console output.
+    """
+
+    def __init__(self):
+        log_queue = queue.SimpleQueue()
+        super().__init__(log_queue)
+        self.listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler())
+        self.listener.start()
+        atexit.register(self.listener.stop)
@@ -1,3 +1,433 @@
-from django.test import TestCase
+import asyncio
+import queue
+import threading
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.test import SimpleTestCase
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import firestore as gcloud_firestore
+from google.cloud.firestore_v1.bulk_writer import BulkWriter
+from google.cloud.firestore_v1.types import BatchWriteResponse, WriteResult
+from google.rpc import status_pb2
+from huggingface_hub import SummarizationOutput, ZeroShotClassificationOutputElement
+from huggingface_hub.errors import HfHubHTTPError
+
+from core import views
+
+
+class TicketWriterTests(SimpleTestCase):
+    """
+    Runs the ticket writer thread against an offline Firestore client, capturing what BulkWriter sends.
+    """
+
+    def setUp(self):
+        client = gcloud_firestore.Client(project="intelliroute-test", credentials=AnonymousCredentials())
+        self.sent = []
+        self.sent_event = threading.Event()
+
+        def fake_send(bulk_writer, batch):
+            self.sent.append([write.update.fields["summary"].string_value for write in batch._write_pbs])
+            self.sent_event.set()
+            return BatchWriteResponse(
+                write_results=[WriteResult() for _ in batch._write_pbs],
+                status=[status_pb2.Status() for _ in batch._write_pbs],
+            )
+
+        for patcher in (
+            mock.patch.object(BulkWriter, "_send", fake_send),
+            mock.patch.object(views, "db", client),
+            mock.patch.object(views, "_TICKETS_REF", client.collection("user_tickets")),
+            mock.patch.object(views, "_ticket_queue", queue.Queue(maxsize=views.TICKET_QUEUE_MAX_SIZE)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.firestore_client = client
+        self.writer = threading.Thread(target=views._write_tickets, daemon=True)
+        self.writer.start()
+
+    def send_ticket(self, summary):
+        self.sent_event.clear()
+        views._ticket_queue.put({"summary": summary})
+        self.assertTrue(self.sent_event.wait(timeout=5), f"ticket {summary!r} was never sent")
+
+    def stop_writer(self):
+        views._ticket_queue.put(None)
+        self.writer.join(timeout=5)
+        self.assertFalse(self.writer.is_alive())
+
+    def test_tickets_from_separate_cycles_are_all_sent(self):
+        self.send_ticket("first")
+        self.send_ticket("second")
+        self.stop_writer()
+
+        self.assertEqual(self.sent, [["first"], ["second"]])
+
+    def test_tickets_queued_before_stop_are_sent(self):
+        views._ticket_queue.put({"summary": "last"})
+        self.stop_writer()
+
+        self.assertEqual(self.sent, [["last"]])
+
+    def test_writer_survives_a_failing_cycle(self):
+        bulk_writer = self.firestore_client.bulk_writer(options=views._TICKET_BULK_WRITER_OPTIONS)
+        with mock.patch.object(self.firestore_client, "bulk_writer", side_effect=[RuntimeError("no writer"), bulk_writer]):
+            views._ticket_queue.put({"summary": "lost"})
+            self.send_ticket("saved")
+        self.stop_writer()
+
+        self.assertEqual(self.sent, [["saved"]])
+
+
+class QueueTicketTests(SimpleTestCase):
+    """
+    The ticket queue is bounded: when the writer falls behind, new tickets are dropped with a warning.
+    """
+
+    def test_full_queue_drops_the_ticket(self):
+        with mock.patch.object(views, "_ticket_queue", queue.Queue(maxsize=1)):
+            views._queue_ticket({"summary": "kept", "tags": ["Praise"]})
+            with self.assertLogs("core.views", level="WARNING"):
+                views._queue_ticket({"summary": "dropped", "tags": ["Billing"]})
+
+            self.assertEqual(views._ticket_queue.get_nowait()["summary"], "kept")
+            self.assertTrue(views._ticket_queue.empty())
+
+
+class AnalyzeFeedbackCacheTests(SimpleTestCase):
+    """
+    The analysis cache is best-effort: its failures must not fail the request.
+    """
+
+    async def test_cache_errors_fall_back_to_the_models(self):
+        results = (
+            SummarizationOutput(summary_text="Checkout fails."),
+            [ZeroShotClassificationOutputElement(label="Bug Report", score=0.9)],
+        )
+        broken_cache = mock.Mock(
+            aget=mock.AsyncMock(side_effect=ConnectionError("cache down")),
+            aset=mock.AsyncMock(side_effect=ConnectionError("cache down")),
+        )
+
+        with (
+            mock.patch.object(views, "cache", broken_cache),
+            mock.patch.object(views, "_call_hf_models", mock.AsyncMock(return_value=results)),
+            mock.patch.object(views, "_TICKETS_REF", None),
+        ):
+            response = await self.async_client.post(
+                "/api/analyze/",
+                {"text": "The checkout page fails every time I try to pay."},
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["tags"], ["Bug Report"])
+        broken_cache.aset.assert_awaited_once()
+
+
+class ShortFeedbackTests(SimpleTestCase):
+    """
+    Feedback too short or without words skips HF and is filed as General Feedback.
+    """
+
+    def analyze(self, text):
+        with (
+            mock.patch.object(views, "_call_hf_models", mock.AsyncMock(side_effect=AssertionError("HF called"))),
+            mock.patch.object(views, "_TICKETS_REF", None),
+        ):
+            return self.client.post("/api/analyze/", {"text": text}, content_type="application/json")
+
+    def test_short_feedback(self):
+        response = self.analyze("  app slow  ")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["summary"], "app slow")
+        self.assertEqual(response.json()["tags"], ["General Feedback"])
+
+    def test_wordless_feedback(self):
+        response = self.analyze("!!!!!!!!!!!!!!!!!!!!????????")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["tags"], ["General Feedback"])
+
+
+class LoopClientTests(SimpleTestCase):
+    """
+    Clients are shared per event loop; under WSGI each request's loop ends with it, so its clients must be closed.
+    """
+
+    def test_wsgi_request_closes_its_clients(self):
+        used = []
+
+        async def call_hf_models(text_input, batch_zero_shot=True):
+            used.append(views._get_http_client())
+            return (
+                SummarizationOutput(summary_text="Checkout fails."),
+                [ZeroShotClassificationOutputElement(label="Bug Report", score=0.9)],
+            )
+
+        with (
+            mock.patch.object(views, "_call_hf_models", call_hf_models),
+            mock.patch.object(views, "_TICKETS_REF", None),
+        ):
+            response = self.client.post(
+                "/api/analyze/",
+                {"text": "The checkout page fails every time I try to pay (WSGI)."},
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(used), 1)
+        self.assertTrue(used[0].is_closed)
+        self.assertEqual(len(views._loop_clients), 0)
+
+
+def _labels_for(texts):
+    """
+    Fake batched zero-shot result: each text is "classified" with itself as the label.
+    """
+    return [[ZeroShotClassificationOutputElement(label=text, score=1.0)] for text in texts]
+
+
+class ZeroShotBatcherTests(SimpleTestCase):
+    """
+    Concurrent zero-shot calls are coalesced into one HF request, with HF stubbed out.
+    """
+
+    def setUp(self):
+        self.query_batch = mock.AsyncMock(side_effect=_labels_for)
+        patcher = mock.patch.object(views, "_query_zero_shot_batch", self.query_batch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.batcher = views._ZeroShotBatcher()
+
+    async def test_full_batch_is_sent_without_waiting_for_the_timer(self):
+        texts = [f"feedback {i}" for i in range(views.ZERO_SHOT_MAX_BATCH_SIZE)]
+        with mock.patch.object(views, "ZERO_SHOT_MAX_BATCH_DURATION_SECS", 60):
+            await asyncio.wait_for(asyncio.gather(*(self.batcher.classify(text) for text in texts)), timeout=5)
+
+        self.query_batch.assert_awaited_once_with(texts)
+
+    async def test_partial_batch_is_sent_when_the_timer_fires(self):
+        texts = ["feedback 1", "feedback 2", "feedback 3"]
+        calls = asyncio.gather(*(self.batcher.classify(text) for text in texts))
+
+        await asyncio.sleep(0)
+        self.query_batch.assert_not_awaited()
+
+        await asyncio.wait_for(calls, timeout=5)
+        self.query_batch.assert_awaited_once_with(texts)
+
+    async def test_each_caller_gets_its_own_result(self):
+        texts = [f"feedback {i}" for i in range(5)]
+        results = await asyncio.gather(*(self.batcher.classify(text) for text in texts))
+
+        self.assertEqual([result[0].label for result in results], texts)
+
+    async def test_error_fails_every_caller_in_the_batch(self):
+        error = ValueError("bad response")
+        self.query_batch.side_effect = error
+
+        results = await asyncio.gather(
+            *(self.batcher.classify(f"feedback {i}") for i in range(3)),
+            return_exceptions=True,
+        )
+
+        self.assertEqual(results, [error] * 3)
+
+    async def test_single_text_uses_the_inference_client(self):
+        hf_client = mock.Mock(
+            zero_shot_classification=mock.AsyncMock(side_effect=lambda text, **kwargs: _labels_for([text])[0])
+        )
+        with mock.patch.object(views, "_get_hf_client", return_value=hf_client):
+            result = await self.batcher.classify("only feedback")
+
+        self.assertEqual(result[0].label, "only feedback")
+        self.query_batch.assert_not_awaited()
+
+
+class WsgiZeroShotTests(SimpleTestCase):
+    """
+    Under WSGI a request's event loop has no other requests to batch with, so the batcher is skipped.
+    """
+
+    def test_wsgi_request_classifies_without_the_batcher(self):
+        hf_client = mock.Mock(
+            summarization=mock.AsyncMock(return_value=SummarizationOutput(summary_text="Checkout fails.")),
+            zero_shot_classification=mock.AsyncMock(return_value=_labels_for(["Bug Report"])[0]),
+        )
+        with (
+            self.settings(HF_MULTI_MODEL_ENDPOINT_URL=""),
+            mock.patch.object(views, "_get_hf_client", return_value=hf_client),
+            mock.patch.object(views, "_get_zero_shot_batcher", side_effect=AssertionError("batcher used")),
+            mock.patch.object(views, "_TICKETS_REF", None),
+        ):
+            response = self.client.post(
+                "/api/analyze/",
+                {"text": "The checkout page fails every time I try to pay (no batching)."},
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["tags"], ["Bug Report"])
+        hf_client.zero_shot_classification.assert_awaited_once()
+
+
+def _hf_reply(body):
+    """
+    Builds a 200 JSON response from HF with this body.
+    """
+    return httpx.Response(200, json=body, request=httpx.Request("POST", "https://router.huggingface.co/"))
+
+
+class QueryZeroShotBatchTests(SimpleTestCase):
+    """
+    Parses batched zero-shot replies from HF, with the HTTP call stubbed.
+    """
+
+    def query(self, texts, body):
+        http_client = mock.Mock(post=mock.AsyncMock(return_value=_hf_reply(body)))
+        with mock.patch.object(views, "_get_http_client", return_value=http_client):
+            return asyncio.run(views._query_zero_shot_batch(texts))
+
+    def test_list_of_label_score_lists(self):
+        results = self.query(
+            ["refund please", "app crashes"],
+            [
+                [{"label": "Billing", "score": 0.8}, {"label": "Praise", "score": 0.2}],
+                [{"label": "Bug Report", "score": 0.7}, {"label": "Praise", "score": 0.3}],
+            ],
+        )
+
+        self.assertEqual([[(e.label, e.score) for e in result] for result in results], [
+            [("Billing", 0.8), ("Praise", 0.2)],
+            [("Bug Report", 0.7), ("Praise", 0.3)],
+        ])
+
+    def test_sequence_labels_scores_objects(self):
+        results = self.query(
+            ["refund please", "app crashes"],
+            [
+                {"sequence": "refund please", "labels": ["Billing", "Praise"], "scores": [0.8, 0.2]},
+                {"sequence": "app crashes", "labels": ["Bug Report", "Praise"], "scores": [0.7, 0.3]},
+            ],
+        )
+
+        self.assertEqual([result[0].label for result in results], ["Billing", "Bug Report"])
+
+    def test_unrecognised_reply_falls_back_to_one_call_per_text(self):
+        classify_one = mock.AsyncMock(side_effect=lambda text: _labels_for([text])[0])
+        with mock.patch.object(views, "_classify_one", classify_one):
+            results = self.query(
+                ["refund please", "app crashes"],
+                {"sequence": "refund please", "labels": ["Billing"], "scores": [0.8]},
+            )
+
+        self.assertEqual([result[0].label for result in results], ["refund please", "app crashes"])
+        self.assertEqual(classify_one.await_count, 2)
+
+
+class QueryMultiModelEndpointTests(SimpleTestCase):
+    """
+    Parses the combined endpoint's reply (see hf_endpoint/handler.py), with the HTTP call stubbed.
+    """
+
+    def query(self, body):
+        http_client = mock.Mock(post=mock.AsyncMock(return_value=_hf_reply(body)))
+        with (
+            self.settings(HF_MULTI_MODEL_ENDPOINT_URL="https://endpoint.example/"),
+            mock.patch.object(views, "_get_http_client", return_value=http_client),
+        ):
+            return asyncio.run(views._query_multi_model_endpoint("The app crashes on login."))
+
+    def test_summary_and_tags(self):
+        summary, tags = self.query({
+            "summary": "App crashes on login.",
+            "tags": [{"label": "Bug Report", "score": 0.9}, {"label": "Praise", "score": 0.1}],
+        })
+
+        self.assertEqual(summary.summary_text, "App crashes on login.")
+        self.assertEqual([(tag.label, tag.score) for tag in tags], [("Bug Report", 0.9), ("Praise", 0.1)])
+
+    def test_missing_key_is_a_clear_error(self):
+        for body in ({"tags": []}, {"summary": "App crashes on login."}):
+            with self.subTest(body=body):
+                with self.assertRaisesRegex(ValueError, "Unexpected multi-model endpoint response"):
+                    self.query(body)
+
+
+def _hf_error(status_code, body):
+    """
+    Builds the HfHubHTTPError raised for an HF response with this status and JSON body.
+    """
+    response = httpx.Response(status_code, json=body, request=httpx.Request("POST", "https://router.huggingface.co/"))
+    return HfHubHTTPError(f"{status_code} error", response=response)
+
+
+class HfWithRetryTests(SimpleTestCase):
+    """
+    Only "model is loading" responses (503 with estimated_time) are retried.
+    """
+
+    def setUp(self):
+        patcher = mock.patch.object(views, "HF_MODEL_LOADING_MAX_WAIT_SECONDS", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_model_loading_is_retried(self):
+        call = mock.AsyncMock(side_effect=[_hf_error(503, {"estimated_time": 20.0}), "result"])
+
+        self.assertEqual(await views._hf_with_retry(call, "text"), "result")
+        self.assertEqual(call.await_count, 2)
+
+    async def test_server_error_is_not_retried(self):
+        call = mock.AsyncMock(side_effect=_hf_error(500, {"error": "boom"}))
+
+        with self.assertRaises(HfHubHTTPError):
+            await views._hf_with_retry(call, "text")
+        self.assertEqual(call.await_count, 1)
+
+    async def test_unavailable_without_estimated_time_is_not_retried(self):
+        call = mock.AsyncMock(side_effect=_hf_error(503, {"error": "overloaded"}))
+
+        with self.assertRaises(HfHubHTTPError):
+            await views._hf_with_retry(call, "text")
+        self.assertEqual(call.await_count, 1)
+
+    async def test_gives_up_after_max_retries(self):
+        call = mock.AsyncMock(side_effect=_hf_error(503, {"estimated_time": 20.0}))
+
+        with self.assertRaises(HfHubHTTPError):
+            await views._hf_with_retry(call, "text", max_retries=2)
+        self.assertEqual(call.await_count, 3)
+
+
+class TruncateForModelsTests(SimpleTestCase):
+    """
+    Long feedback is cut after the last token the models read, with the tokenizer stubbed.
+    """
+
+    def truncate(self, text, encoding):
+        tokenizer = mock.Mock(encode=mock.Mock(return_value=encoding)) if encoding else None
+        with mock.patch.object(views, "_get_tokenizer", return_value=tokenizer):
+            return views._truncate_for_models(text)
+
+    def test_text_within_the_limit_is_unchanged(self):
+        text = "Refund still missing."
+        encoding = SimpleNamespace(overflowing=[], offsets=[(0, 6), (6, 12), (12, 20), (20, 21)])
+
+        self.assertIs(self.truncate(text, encoding), text)
+
+    def test_overflowing_text_is_cut_after_the_last_kept_token(self):
+        text = "Café crashed — again and again"
+        # Kept tokens cover "Café crashed — again"; character offsets, not byte offsets
+        encoding = SimpleNamespace(overflowing=[object()], offsets=[(0, 4), (4, 12), (12, 14), (14, 20)])
+
+        self.assertEqual(self.truncate(text, encoding), "Café crashed — again")
+
+    def test_missing_tokenizer_passes_the_text_through(self):
+        text = "x" * views.TRUNCATION_MIN_CHARS
+
+        self.assertIs(self.truncate(text, None), text)
@@ -1,34 +1,106 @@
-import json
+import asyncio
+import atexit
+import hashlib
+import logging
+import orjson
 import time
-import requests
+import httpx
 import os
+import queue
+import threading
+import weakref
+from collections import defaultdict
 from pathlib import Path
 
 # Django Imports
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import RequestDataTooBig
+from django.core.handlers.asgi import ASGIRequest
 
 # Hugging Face Imports
-from huggingface_hub import InferenceClient
+from huggingface_hub import AsyncInferenceClient, SummarizationOutput, ZeroShotClassificationOutputElement, hf_hub_download
+from huggingface_hub.errors import HfHubHTTPError
+from tokenizers import ByteLevelBPETokenizer
 
 # Firebase Imports
 import firebase_admin
 from firebase_admin import credentials, firestore, initialize_app
 from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions, SendMode
 import google.auth.exceptions
 
 
+logger = logging.getLogger(__name__)
+
+
 # --- HUGGING FACE API CONFIGURATION ---
 MODEL_SUMMARIZATION = "sshleifer/distilbart-cnn-12-6"
 MODEL_SENTIMENT = "distilbert-base-uncased-finetuned-sst-2-english"
 MODEL_ZERO_SHOT = "facebook/bart-large-mnli"
 CLASSIFIER_LABELS = ["Urgent", "Billing", "Technical Support", "Bug Report", "Feature Request", "Praise", "General Feedback"]
+# Constant parts of the raw HF requests, built once instead of per call
+_ZS_URL = f"https://router.huggingface.co/hf-inference/models/{MODEL_ZERO_SHOT}"
+_ZS_PARAMS = {"candidate_labels": CLASSIFIER_LABELS}
 # Define the strict priority order for custom sorting
 PRIORITY_ORDER = ["Urgent", "Billing", "Technical Support", "Bug Report", "Feature Request", "Praise", "General Feedback"]
-# Create a map for quick priority lookup (lower number is higher priority)
-PRIORITY_MAP = {label: index for index, label in enumerate(PRIORITY_ORDER)}
+# Rank given to tags outside PRIORITY_ORDER (sorts them to the bottom)
+DEFAULT_PRIORITY_RANK = 100
+# Create a map for quick priority lookup (lower number is higher priority); unknown tags get the default rank
+PRIORITY_MAP = defaultdict(lambda: DEFAULT_PRIORITY_RANK, {label: index for index, label in enumerate(PRIORITY_ORDER)})
+# Feedback shorter than this is not worth sending to the models
+MIN_ANALYZABLE_LENGTH = 15
+# Per-call timeout for the HF endpoints (cold models can take a while to respond)
+HF_TIMEOUT_SECONDS = 60.0
+# HF answers 503 with an estimated_time while a cold model loads: retry this many times,
+# waiting the estimate (capped at HF_MODEL_LOADING_MAX_WAIT_SECONDS) before each retry
+HF_MODEL_LOADING_MAX_RETRIES = 2
+HF_MODEL_LOADING_MAX_WAIT_SECONDS = 3.0
+# How long analysis results for identical feedback are reused
+ANALYSIS_CACHE_TTL_SECONDS = 60 * 60 * 24
+# Concurrent zero-shot requests are sent to HF together, up to this many per call...
+ZERO_SHOT_MAX_BATCH_SIZE = 8
+# ...or after waiting this long for the batch to fill, whichever comes first
+ZERO_SHOT_MAX_BATCH_DURATION_SECS = 0.05
+# The models only read this many tokens; longer feedback is trimmed before it is uploaded
+MODEL_MAX_INPUT_TOKENS = 1024
+# Texts shorter than this practically never reach the token limit, so they skip tokenization
+TRUNCATION_MIN_CHARS = 4000
+# ----------------------------------------
+
+# --- TOKENIZER SETUP ---
+# Loaded on the first feedback long enough to need trimming rather than at import, so start-up
+# never waits on the Hub; without it long feedback is simply sent untrimmed
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+
+
+def _get_tokenizer():
+    """
+    Returns the summarization model's (byte-level BPE) tokenizer, downloading it on first use.
+    Returns None if that failed; the load is not retried, so an outage doesn't slow every long request.
+    """
+    global _tokenizer, _tokenizer_loaded
+    with _tokenizer_lock:
+        if not _tokenizer_loaded:
+            _tokenizer_loaded = True
+            try:
+                tokenizer = ByteLevelBPETokenizer(
+                    hf_hub_download(MODEL_SUMMARIZATION, "vocab.json"),
+                    hf_hub_download(MODEL_SUMMARIZATION, "merges.txt"),
+                )
+                # Leave room for the <s> and </s> tokens the model adds around the text
+                tokenizer.enable_truncation(max_length=MODEL_MAX_INPUT_TOKENS - 2)
+                _tokenizer = tokenizer
+            except Exception as e:
+                logger.warning(
+                    "Could not load the %s tokenizer, long feedback will not be trimmed: %s", MODEL_SUMMARIZATION, e
+                )
+    return _tokenizer
 # ----------------------------------------
 
 # --- FIREBASE SETUP ---
@@ -38,23 +110,131 @@ try:
     key_path = settings.BASE_DIR / 'serviceAccountKey.json'
     
     if not key_path.exists():
-        print("!!!!!!!!!!!!!!!!!!!!!!!!! WARNING !!!!!!!!!!!!!!!!!!!!!!!!!!")
-        print(f"serviceAccountKey.json not found at {key_path}")
-        print("The dashboard will not work until the file is placed correctly.")
-        print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+        logger.warning(
+            "serviceAccountKey.json not found at %s. "
+            "The dashboard will not work until the file is placed correctly.",
+            key_path,
+        )
     
     cred = credentials.Certificate(str(key_path))
     firebase_admin.initialize_app(cred)
     db = firestore.client()
-    print("Firebase Admin SDK initialized successfully.")
+    logger.info("Firebase Admin SDK initialized successfully.")
 
 except ValueError:
     # Catches the error if initialize_app() was already called
-    print("Firebase Admin SDK already initialized.")
+    logger.info("Firebase Admin SDK already initialized.")
     db = firestore.client()
 except Exception as e:
-    print(f"Error initializing Firebase Admin SDK: {e}")
+    logger.error("Error initializing Firebase Admin SDK: %s", e)
     # db remains None if initialization fails
+
+# Tickets for the demo user; the collection reference is built once instead of on every request
+DEMO_USER_ID = "demo_user"
+_TICKETS_REF = db.collection('user_tickets').document(DEMO_USER_ID).collection('tickets') if db else None
+if _TICKETS_REF is None:
+    # Reported once here rather than on every request
+    logger.warning("Firestore (db) is not initialized. Tickets will not be saved.")
+
+# Tickets are queued by the view and written by one background thread through a Firestore BulkWriter,
+# which coalesces them into batched commits instead of one RPC per ticket
+TICKET_FLUSH_INTERVAL_SECONDS = 0.25
+TICKET_WRITE_MAX_ATTEMPTS = 3
+# Serial mode commits on the writer thread itself instead of a ThreadPoolExecutor, which refuses
+# new work once the interpreter starts shutting down (and would drop the final flush at exit)
+_TICKET_BULK_WRITER_OPTIONS = BulkWriterOptions(mode=SendMode.serial)
+# Tickets waiting for the writer; if it falls this far behind (e.g. Firestore is down), new tickets are dropped
+TICKET_QUEUE_MAX_SIZE = 1000
+_ticket_queue = queue.Queue(maxsize=TICKET_QUEUE_MAX_SIZE)
+
+
+def _on_ticket_write_error(error, bulk_writer):
+    """
+    BulkWriter error callback: logs the failure and retries until TICKET_WRITE_MAX_ATTEMPTS is reached.
+    """
+    retry = error.attempts < TICKET_WRITE_MAX_ATTEMPTS
+    if retry:
+        logger.warning("Error saving to Firestore, retrying: %s", error.message)
+    else:
+        logger.error("Error saving to Firestore, giving up: %s", error.message)
+    return retry
+
+
+def _write_ticket_cycle(ticket):
+    """
+    Writes `ticket` plus everything queued within TICKET_FLUSH_INTERVAL_SECONDS through a fresh BulkWriter
+    (a flushed BulkWriter stops sending until it fills a whole batch again).
+    Returns True once the None ticket that stops the writer has been seen.
+    """
+    if ticket is None:
+        return True
+    flush_at = time.monotonic() + TICKET_FLUSH_INTERVAL_SECONDS
+
+    bulk_writer = db.bulk_writer(options=_TICKET_BULK_WRITER_OPTIONS)
+    bulk_writer.on_write_error(_on_ticket_write_error)
+    stopping = False
+    while True:
+        try:
+            bulk_writer.create(_TICKETS_REF.document(), ticket)
+        except Exception:
+            logger.exception("Error saving to Firestore")
+        try:
+            ticket = _ticket_queue.get(timeout=max(flush_at - time.monotonic(), 0))
+        except queue.Empty:
+            break
+        if ticket is None:
+            stopping = True
+            break
+
+    try:
+        bulk_writer.close()
+    except Exception:
+        logger.exception("Error flushing tickets to Firestore")
+    return stopping
+
+
+def _write_tickets():
+    """
+    Body of the ticket writer thread: writes the queued tickets one cycle at a time until a None ticket arrives.
+    A failing cycle is logged and its tickets lost, but the thread keeps going.
+    """
+    stopping = False
+    while not stopping:
+        ticket = _ticket_queue.get()
+        try:
+            stopping = _write_ticket_cycle(ticket)
+        except Exception:
+            logger.exception("Error writing tickets to Firestore")
+
+
+def _queue_ticket(ticket):
+    """
+    Hands a ticket to the writer thread without blocking the request; drops it with a warning if the queue is full.
+    """
+    try:
+        _ticket_queue.put_nowait(ticket)
+    except queue.Full:
+        logger.warning(
+            "Ticket queue is full (%d tickets), dropping ticket tagged %s", TICKET_QUEUE_MAX_SIZE, ticket.get('tags')
+        )
+
+
+def _stop_ticket_writer():
+    """
+    Flushes the queued tickets on process shutdown.
+    """
+    try:
+        _ticket_queue.put(None, timeout=5)
+    except queue.Full:
+        logger.warning("Ticket writer is not keeping up, %d tickets were not saved", TICKET_QUEUE_MAX_SIZE)
+        return
+    _ticket_writer.join(timeout=5)
+
+
+if _TICKETS_REF is not None:
+    _ticket_writer = threading.Thread(target=_write_tickets, name='firestore-ticket-writer', daemon=True)
+    _ticket_writer.start()
+    atexit.register(_stop_ticket_writer)
 # ----------------------------------------
 
 def index(request):
@@ -76,118 +256,425 @@ def sort_by_priority(tag_list):
     Sorts a list of tags (strings) based on the predefined PRIORITY_ORDER.
     Tags not in the map are moved to the bottom.
     """
-    return sorted(tag_list, key=lambda tag: PRIORITY_MAP.get(tag, 100))
+    return sorted(tag_list, key=lambda tag: PRIORITY_MAP.get(tag, DEFAULT_PRIORITY_RANK))
 
 
-@csrf_exempt
-def analyze_feedback(request):
+def _truncate_for_models(text_input):
     """
-    Receives text, calls the correct HF API endpoints, and returns analysis JSON.
-    Also saves the result to Firestore.
+    Cuts the text down to the MODEL_MAX_INPUT_TOKENS tokens the models actually read.
     """
-    if request.method != 'POST':
-        return JsonResponse({'error': 'Only POST requests are allowed'}, status=405)
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return text_input
+    encoding = tokenizer.encode(text_input)
+    if not encoding.overflowing:
+        return text_input
+    # Cut the original string after the last kept token instead of decoding the ids back to text
+    return text_input[:encoding.offsets[-1][1]]
 
-    try:
-        data = json.loads(request.body)
-        text_input = data.get('text', '')
-        if not text_input.strip():
-            return JsonResponse({'error': 'Text input cannot be empty'}, status=400)
 
-        # 1. Create ONE client
-        client = InferenceClient(
+def _json_response(data, status=200):
+    """
+    Builds a JSON HttpResponse, serialized with orjson (much faster than the stdlib json behind JsonResponse).
+    """
+    return HttpResponse(orjson.dumps(data), content_type="application/json", status=status)
+
+
+def _analysis_cache_key(text_input):
+    """
+    Builds the cache key for a piece of feedback.
+    Whitespace is collapsed so trivially re-formatted duplicates share an entry.
+    """
+    normalized = " ".join(text_input.split())
+    return "analysis:" + hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+class _LoopClients:
+    """
+    The HF clients shared by the requests on one event loop (their connections can't be used from another loop):
+    the AsyncInferenceClient for the per-model calls and an httpx.AsyncClient for the raw requests.
+    """
+
+    def __init__(self):
+        self.hf_client = AsyncInferenceClient(
             provider="hf-inference",
             api_key=settings.HF_API_TOKEN,
+            timeout=HF_TIMEOUT_SECONDS,
         )
-
-        # --- API CALLS ---
-        # 2. Call Summarization
-        summary = client.summarization(
-            text_input,
-            model=MODEL_SUMMARIZATION,
+        transport = httpx.AsyncHTTPTransport(
+            # Retries connection failures only; HTTP error statuses are left to the caller
+            retries=2,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+        )
+        self.http_client = httpx.AsyncClient(
+            transport=transport,
+            timeout=HF_TIMEOUT_SECONDS,
+            headers={"Authorization": f"Bearer {settings.HF_API_TOKEN}", "Content-Type": "application/json"},
         )
-        print('Summary', summary)
 
-        # --- Sentiment calls removed ---
+    async def aclose(self):
+        """
+        Closes both clients and their connections.
+        """
+        await self.hf_client.close()
+        await self.http_client.aclose()
 
-        # 4. Call Zero-Shot Classification (Manual Requests Call - as per user instruction)
-        # Using model-specific URL as defined by the user
-        API_URL = "https://router.huggingface.co/hf-inference/models/facebook/bart-large-mnli"
-        headers = {
-            "Authorization": f"Bearer {settings.HF_API_TOKEN}",
-        }
 
-        def query(payload):
-            response = requests.post(API_URL, headers=headers, json=payload)
-            return response.json()
+# Clients per event loop. Under ASGI every request runs on the worker's one loop, so connections to HF stay
+# alive between requests; under WSGI (runserver) each request gets its own loop, closed by the view when it ends
+_loop_clients = weakref.WeakKeyDictionary()
 
-        tags_payload = {
-            "inputs": text_input,
-            "parameters": {"candidate_labels": CLASSIFIER_LABELS},
-        }
-        
-        tags = query(tags_payload)
-        print('tags', tags)
+
+def _get_loop_clients():
+    """
+    Returns the clients of the running event loop, creating the holder on first use.
+    """
+    loop = asyncio.get_running_loop()
+    loop_clients = _loop_clients.get(loop)
+    if loop_clients is None:
+        loop_clients = _loop_clients[loop] = _LoopClients()
+    return loop_clients
+
+
+async def _close_loop_clients():
+    """
+    Closes and forgets the running event loop's clients.
+    """
+    loop_clients = _loop_clients.pop(asyncio.get_running_loop(), None)
+    if loop_clients is not None:
+        await loop_clients.aclose()
+
+
+def _get_hf_client():
+    """
+    Returns the AsyncInferenceClient shared by the requests on this event loop.
+    """
+    return _get_loop_clients().hf_client
+
+
+def _get_http_client():
+    """
+    Returns the httpx.AsyncClient shared by the raw HF requests on this event loop; it carries the auth headers.
+    """
+    return _get_loop_clients().http_client
+
+
+def _model_loading_estimate(error):
+    """
+    Returns HF's estimated_time if the error is a 503 "model is currently loading" response, otherwise None.
+    """
+    response = getattr(error, 'response', None)
+    if response is None or response.status_code != 503:
+        return None
+    try:
+        estimated_time = orjson.loads(response.content).get('estimated_time')
+    except (orjson.JSONDecodeError, AttributeError):
+        return None
+    return estimated_time if isinstance(estimated_time, (int, float)) else None
+
+
+async def _hf_with_retry(fn, *args, max_retries=HF_MODEL_LOADING_MAX_RETRIES, **kwargs):
+    """
+    Awaits an HF call, retrying only while the model is still loading (503 with estimated_time).
+    Every other error is raised straight away.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return await fn(*args, **kwargs)
+        except (HfHubHTTPError, httpx.HTTPStatusError) as e:
+            estimated_time = _model_loading_estimate(e)
+            if estimated_time is None or attempt == max_retries:
+                raise
+            delay = min(estimated_time, HF_MODEL_LOADING_MAX_WAIT_SECONDS)
+            logger.info("HF model is loading, retrying in %.1fs", delay)
+            await asyncio.sleep(delay)
+
+
+async def _classify_one(text):
+    """
+    Classifies a single text through the shared InferenceClient.
+    """
+    return await _hf_with_retry(
+        _get_hf_client().zero_shot_classification,
+        text,
+        candidate_labels=CLASSIFIER_LABELS,
+        model=MODEL_ZERO_SHOT,
+    )
+
+
+def _parse_zero_shot_result(result):
+    """
+    Turns one text's zero-shot result into a list of ZeroShotClassificationOutputElement.
+    Accepts both the current [{label, score}, ...] shape and the older {sequence, labels, scores} one.
+    """
+    if isinstance(result, dict) and "labels" in result and "scores" in result:
+        return [
+            ZeroShotClassificationOutputElement(label=label, score=score)
+            for label, score in zip(result["labels"], result["scores"])
+        ]
+    if isinstance(result, list) and all(isinstance(item, dict) and "label" in item and "score" in item for item in result):
+        return ZeroShotClassificationOutputElement.parse_obj_as_list(result)
+    raise ValueError(f"unrecognised zero-shot result: {result}")
+
+
+async def _query_zero_shot_batch(texts):
+    """
+    Classifies several texts in one call to bart-large-mnli.
+    Returns one list of ZeroShotClassificationOutputElement per text, in input order.
+    If HF answers the batch in a shape we don't recognise, the texts are classified one by one instead.
+    """
+    # InferenceClient.zero_shot_classification only takes a single text, so batches are POSTed directly
+    payload = {"inputs": texts, "parameters": _ZS_PARAMS}
+
+    response = await _get_http_client().post(_ZS_URL, content=orjson.dumps(payload))
+    response.raise_for_status()
+
+    results = orjson.loads(response.content)
+    try:
+        if not isinstance(results, list) or len(results) != len(texts):
+            raise ValueError(f"expected {len(texts)} results, got {results}")
+        return [_parse_zero_shot_result(result) for result in results]
+    except ValueError as e:
+        logger.warning("Unexpected zero-shot batch response, classifying the texts one by one: %s", e)
+        return list(await asyncio.gather(*(_classify_one(text) for text in texts)))
+
+
+class _ZeroShotBatcher:
+    """
+    Collects zero-shot requests arriving on one event loop and sends them to HF as a single batched call.
+    Each caller awaits its own future and gets back only the result for its text.
+    A batch of one goes through the shared InferenceClient instead.
+    """
+
+    def __init__(self):
+        self.pending = []
+        self.flush_handle = None
+        self.in_flight = set()
+
+    async def classify(self, text):
+        """
+        Queues the text for the next batch and waits for its zero-shot result.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((text, future))
+
+        if len(self.pending) >= ZERO_SHOT_MAX_BATCH_SIZE:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(ZERO_SHOT_MAX_BATCH_DURATION_SECS, self.flush)
+
+        return await future
+
+    def flush(self):
+        """
+        Sends everything queued so far as one batch (runs on the size limit or when the timer fires).
+        """
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self.send(batch))
+            # Keep a reference until the call finishes so the task isn't garbage collected
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+
+    async def send(self, batch):
+        """
+        Classifies one batch and resolves each caller's future with its own result.
+        """
+        try:
+            if len(batch) == 1:
+                text, _ = batch[0]
+                results = [await _classify_one(text)]
+            else:
+                results = await _hf_with_retry(_query_zero_shot_batch, [text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+# One batcher per event loop: futures and timers can't be shared across loops
+_zero_shot_batchers = weakref.WeakKeyDictionary()
+
+
+def _get_zero_shot_batcher():
+    """
+    Returns the batcher for the running event loop, creating it on first use.
+    """
+    loop = asyncio.get_running_loop()
+    batcher = _zero_shot_batchers.get(loop)
+    if batcher is None:
+        batcher = _zero_shot_batchers[loop] = _ZeroShotBatcher()
+    return batcher
+
+
+async def _query_multi_model_endpoint(text_input):
+    """
+    Runs Summarization and Zero-Shot Classification with one call to the combined Inference Endpoint
+    (see hf_endpoint/handler.py). Returns (summary, tags) as the same types the per-model calls produce.
+    """
+    payload = {
+        "inputs": text_input,
+        "tasks": ["summarize", "zero_shot"],
+        "candidate_labels": CLASSIFIER_LABELS,
+    }
+
+    response = await _get_http_client().post(
+        settings.HF_MULTI_MODEL_ENDPOINT_URL,
+        content=orjson.dumps(payload),
+    )
+    response.raise_for_status()
+
+    result = orjson.loads(response.content)
+    if not isinstance(result, dict) or not isinstance(result.get("summary"), str) or "tags" not in result:
+        raise ValueError(f"Unexpected multi-model endpoint response: {result}")
+    return (
+        SummarizationOutput(summary_text=result["summary"]),
+        _parse_zero_shot_result(result["tags"]),
+    )
+
+
+async def _call_hf_models(text_input, batch_zero_shot=True):
+    """
+    Runs Summarization and Zero-Shot Classification for the text and returns (summary, tags).
+    batch_zero_shot=False skips the micro-batcher: without other requests on the loop to share a batch
+    with (WSGI), it would only add its timer to the call.
+    """
+    # A combined multi-model endpoint answers both tasks in one round-trip
+    if settings.HF_MULTI_MODEL_ENDPOINT_URL:
+        return await _hf_with_retry(_query_multi_model_endpoint, text_input)
+
+    # 1. Reuse the shared async client
+    client = _get_hf_client()
+
+    # --- API CALLS ---
+    # 2. Call Summarization and Zero-Shot Classification concurrently.
+    # Both only depend on text_input, so the wall time is the slowest call, not the sum.
+    zero_shot = _get_zero_shot_batcher().classify(text_input) if batch_zero_shot else _classify_one(text_input)
+    summary, tags = await asyncio.gather(
+        _hf_with_retry(client.summarization, text_input, model=MODEL_SUMMARIZATION),
+        zero_shot,
+        return_exceptions=True,
+    )
+
+    # Re-raise the first failure so the view's error handlers can report it
+    for result in (summary, tags):
+        if isinstance(result, BaseException):
+            raise result
+
+    return summary, tags
+
+
+@csrf_exempt
+async def analyze_feedback(request):
+    """
+    Receives text, calls the correct HF API endpoints concurrently, and returns analysis JSON.
+    Also saves the result to Firestore.
+    """
+    try:
+        return await _analyze_feedback(request)
+    finally:
+        # Outside ASGI this request's event loop ends with it, so its clients can't be reused
+        if not isinstance(request, ASGIRequest):
+            await _close_loop_clients()
+
+
+async def _analyze_feedback(request):
+    if request.method != 'POST':
+        return _json_response({'error': 'Only POST requests are allowed'}, status=405)
+
+    try:
+        try:
+            body = request.body
+        except RequestDataTooBig:
+            return _json_response({'error': 'Feedback is too large to analyze'}, status=413)
+        text_input = orjson.loads(body).get('text', '')
+        stripped = text_input.strip()
+        if not stripped:
+            return _json_response({'error': 'Text input cannot be empty'}, status=400)
+
+        # 1. Too short or no words at all ("lol", "test", "???"): nothing for the models to work with,
+        # so skip HF and file it as General Feedback with the text itself as the summary
+        if len(stripped) < MIN_ANALYZABLE_LENGTH or not any(char.isalnum() for char in stripped):
+            summary = SummarizationOutput(summary_text=stripped)
+            tags = [ZeroShotClassificationOutputElement(label="General Feedback", score=1.0)]
+        else:
+            # 2. Trim very long feedback to what the models read, so the excess isn't uploaded (twice)
+            if len(text_input) >= TRUNCATION_MIN_CHARS:
+                text_input = await asyncio.to_thread(_truncate_for_models, text_input)
+
+            # 3. Reuse the model outputs for repeat feedback, otherwise call HF
+            # The cache only saves HF calls, so an unreachable backend (e.g. Redis) is logged, not fatal
+            cache_key = _analysis_cache_key(text_input)
+            try:
+                results = await cache.aget(cache_key)
+            except Exception as e:
+                logger.warning("Error reading the analysis cache: %s", e)
+                results = None
+            if results is None:
+                # Only ASGI serves concurrent requests on one loop, so only there can zero-shot calls be batched
+                results = await _call_hf_models(text_input, batch_zero_shot=isinstance(request, ASGIRequest))
+                try:
+                    await cache.aset(cache_key, results, ANALYSIS_CACHE_TTL_SECONDS)
+                except Exception as e:
+                    logger.warning("Error writing the analysis cache: %s", e)
+            summary, tags = results
+
+        logger.debug("Summary %s", summary)
+        logger.debug("tags %s", tags)
+
+        # --- Sentiment calls removed ---
 
         # --- PROCESS RESULTS ---
-        
-        # 'summary' is a SummarizationOutput OBJECT.
-        processed_summary = "Analysis failed."
-        if summary and hasattr(summary, 'summary_text'):
-            processed_summary = summary.summary_text
+        # 'summary' is a SummarizationOutput OBJECT (every path above builds one), so read it directly.
+        processed_summary = summary.summary_text if summary else "Analysis failed."
 
         # --- Sentiment processing removed ---
         
-        # 'tags' is a LIST of DICTIONARIES (from the requests call)
+        # 'tags' is a LIST of ZeroShotClassificationOutputElement OBJECTS.
         processed_tag = "General Feedback"  # Default to lowest priority tag
-        processed_rank = 100  # Default rank
+        processed_rank = DEFAULT_PRIORITY_RANK  # Default rank
         
         # Logic: Select tag based on MODEL CONFIDENCE (highest score)
-        if tags and isinstance(tags, list) and len(tags) > 0 and isinstance(tags[0], dict):
-            # Sort tags by confidence score first (highest score at tags[0])
-            tags.sort(key=lambda x: x.get('score', 0), reverse=True)
-            
-            # Select the single, highest-scoring tag
-            top_tag = tags[0].get('label')
+        if tags:
+            # Select the single, highest-scoring tag (a max() pass; no need to sort or mutate the list)
+            top_tag = max(tags, key=lambda x: x.score).label
             
             if top_tag:
                 processed_tag = top_tag
                 # Calculate priority rank of the SELECTED tag for dashboard sorting
-                processed_rank = PRIORITY_MAP.get(processed_tag, 100)
+                processed_rank = PRIORITY_MAP[processed_tag]
 
         # Final response structure (sentiment removed)
-        response_data = {
+        response_data_for_json = {
             'summary': processed_summary,
             # Store the single, highest-scoring tag
             'tags': [processed_tag],
             # Store the priority rank for dashboard sorting
             'priority_rank': processed_rank,
-            'timestamp': firestore.SERVER_TIMESTAMP
         }
 
         # --- Save to Firestore ---
-        # Strip the SERVER_TIMESTAMP before creating the JsonResponse
-        response_data_for_json = response_data.copy()
-        del response_data_for_json['timestamp'] 
-        
-        demo_user_id = "demo_user"
-        try:
-            if db:
-                # Add the original response_data (with the SERVER_TIMESTAMP) to Firestore
-                tickets_ref = db.collection('user_tickets').document(demo_user_id).collection('tickets')
-                tickets_ref.add(response_data)
-            else:
-                print("Firestore (db) is not initialized. Skipping save.")
-        except Exception as e:
-            print(f"Error saving to Firestore: {e}")
-            pass
+        if _TICKETS_REF is not None:
+            # Firestore gets the same fields plus a SERVER_TIMESTAMP (which can't go into the JSON response);
+            # the background ticket writer saves it, so the client doesn't wait for the write
+            _queue_ticket({**response_data_for_json, 'timestamp': firestore.SERVER_TIMESTAMP})
 
-        return JsonResponse(response_data_for_json)
+        return _json_response(response_data_for_json)
 
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'Invalid JSON in request body'}, status=400)
-    except requests.exceptions.HTTPError as e:
-         # Capture specific API errors like 404, 401, 503 from the requests call
-        return JsonResponse({'error': f'Hugging Face API Error: {e.response.status_code} - {e.response.text}'}, status=e.response.status_code)
+    except orjson.JSONDecodeError:
+        return _json_response({'error': 'Invalid JSON in request body'}, status=400)
+    except (HfHubHTTPError, httpx.HTTPStatusError) as e:
+        # Capture specific API errors like 404, 401, 503 from the HF calls
+        return _json_response({'error': f'Hugging Face API Error: {e.response.status_code} - {e.response.text}'}, status=e.response.status_code)
     except Exception as e:
-        return JsonResponse({'error': f'An unexpected error occurred: {str(e)}'}, status=500)
+        return _json_response({'error': f'An unexpected error occurred: {str(e)}'}, status=500)
@@ -0,0 +1,36 @@
+from transformers import pipeline
+
+
+MODEL_SUMMARIZATION = "sshleifer/distilbart-cnn-12-6"
+MODEL_ZERO_SHOT = "facebook/bart-large-mnli"
+
+
+class EndpointHandler:
+    """
+    Custom handler for a Hugging Face Inference Endpoint that serves both IntelliRoute models,
+    so the app can summarize and classify a piece of feedback in a single request.
+
+    Request:  {"inputs": "...", "tasks": ["summarize", "zero_shot"], "candidate_labels": [...]}
+    Response: {"summary": "...", "tags": [{"label": "...", "score": 0.9}, ...]}
+    """
+
+    def __init__(self, path=""):
+        self.summarizer = pipeline("summarization", model=MODEL_SUMMARIZATION)
+        self.classifier = pipeline("zero-shot-classification", model=MODEL_ZERO_SHOT)
+
+    def __call__(self, data):
+        text = data["inputs"]
+        tasks = data.get("tasks", ["summarize", "zero_shot"])
+        result = {}
+
+        if "summarize" in tasks:
+            result["summary"] = self.summarizer(text, truncation=True)[0]["summary_text"]
+
+        if "zero_shot" in tasks:
+            output = self.classifier(text, candidate_labels=data["candidate_labels"])
+            result["tags"] = [
+                {"label": label, "score": score}
+                for label, score in zip(output["labels"], output["scores"])
+            ]
+
+        return result
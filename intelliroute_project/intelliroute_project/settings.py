@@ -21,6 +21,8 @@ load_dotenv(os.path.join(BASE_DIR, '.env'))
 
 SECRET_KEY = os.environ.get('SECRET_KEY')
 HF_API_TOKEN = os.environ.get('HF_API_TOKEN')
+# Optional Inference Endpoint serving both models (hf_endpoint/handler.py); unset = call each model separately
+HF_MULTI_MODEL_ENDPOINT_URL = os.environ.get('HF_MULTI_MODEL_ENDPOINT_URL')
 
 #DEBUG = True
 DEBUG = False
@@ -82,10 +84,43 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Keep connections open across requests instead of reconnecting every time
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Analysis results for repeat feedback are served from here instead of re-running HF inference.
+# Use Redis when REDIS_URL is set so the cache is shared across workers.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
+# Request size
+# https://docs.djangoproject.com/en/5.2/ref/settings/#data-upload-max-memory-size
+# Analyzer requests are just {"text": ...}; bigger bodies get a 413 instead of being parsed
+# (the ASGI server still receives them in full, the cap only saves the parsing and analysis).
+# The summarization model only takes ~1024 tokens anyway.
+DATA_UPLOAD_MAX_MEMORY_SIZE = 64 * 1024
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -105,6 +140,35 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+# App logs are handed to a queue and written by a background thread, off the request path.
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "simple": {
+            "format": "{levelname} {asctime} {name}: {message}",
+            "style": "{",
+        },
+    },
+    "handlers": {
+        "queue": {
+            "()": "core.log.QueueListenerHandler",
+            "formatter": "simple",
+        },
+    },
+    "loggers": {
+        "core": {
+            "handlers": ["queue"],
+            "level": os.environ.get("LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 